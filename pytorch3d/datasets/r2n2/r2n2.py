@@ -160,6 +160,7 @@ class R2N2(ShapeNetBase):
                     )
                     warnings.warn(msg)
                     continue
+                self.model_id_to_idx[model] = len(self.model_ids)
                 self.synset_ids.append(synset)
                 self.model_ids.append(model)
 
@@ -192,6 +193,7 @@ class R2N2(ShapeNetBase):
                 "official mapping but not found in the dataset location %s: %s"
             ) % (shapenet_dir, ", ".join(synset_not_present))
             warnings.warn(msg)
+        self._finalize_index()
 
     def __getitem__(self, model_idx, view_idxs: Optional[List[int]] = None) -> Dict:
         """
@@ -245,9 +247,7 @@ class R2N2(ShapeNetBase):
             model_views = view_idxs
 
         model = self._get_item_ids(model_idx)
-        model_path = path.join(
-            self.shapenet_dir, model["synset_id"], model["model_id"], "model.obj"
-        )
+        model_path = self._all_paths[model_idx]
 
         verts, faces, textures = self._load_mesh(model_path)
         model["verts"] = verts
@@ -412,7 +412,7 @@ class R2N2(ShapeNetBase):
             K=kwargs.get("K", k),
             device=device,
         )
-        cameras = kwargs.get("cameras", blend_cameras).to(device)
+        cameras = self._ensure_device(kwargs.get("cameras", blend_cameras), device)
         kwargs.pop("cameras", None)
         # pass down all the same inputs
         return super().render(
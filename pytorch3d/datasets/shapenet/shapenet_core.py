@@ -122,10 +122,12 @@ class ShapeNetCore(ShapeNetBase):
                     ) % (model, synset)
                     warnings.warn(msg)
                     continue
+                self.model_id_to_idx[model] = len(self.model_ids)
                 self.synset_ids.append(synset)
                 self.model_ids.append(model)
             model_count = len(self.synset_ids) - self.synset_start_idxs[synset]
             self.synset_num_models[synset] = model_count
+        self._finalize_index()
 
     def __getitem__(self, idx: int) -> Dict:
         """
@@ -143,9 +145,7 @@ class ShapeNetCore(ShapeNetBase):
             - label (str): synset label.
         """
         model = self._get_item_ids(idx)
-        model_path = path.join(
-            self.shapenet_dir, model["synset_id"], model["model_id"], self.model_dir
-        )
+        model_path = self._all_paths[idx]
         verts, faces, textures = self._load_mesh(model_path)
         model["verts"] = verts
         model["faces"] = faces
@@ -1,8 +1,15 @@
 # Copyright (c) Facebook, Inc. and its affiliates. All rights reserved.
 
+import mmap
+import os
+import random
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from os import path
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import torch
 from pytorch3d.io import load_obj
 from pytorch3d.renderer import (
@@ -12,8 +19,10 @@ from pytorch3d.renderer import (
     MeshRenderer,
     PointLights,
     RasterizationSettings,
+    SoftSilhouetteShader,
     TexturesVertex,
 )
+from pytorch3d.structures import Meshes
 
 from .utils import collate_batched_meshes
 
@@ -31,13 +40,31 @@ class ShapeNetBase(torch.utils.data.Dataset):
         """
         self.synset_ids = []
         self.model_ids = []
+        # Mapping from model_id to its index in model_ids, populated by the
+        # child class alongside model_ids for O(1) lookups in render.
+        self.model_id_to_idx = {}
         self.synset_inv = {}
         self.synset_start_idxs = {}
         self.synset_num_models = {}
+        # Struct-of-arrays view of the synset bookkeeping built by
+        # _finalize_index: a row index per synset plus parallel start/length
+        # arrays, so lookups cost one hash plus two array reads.
+        self._syn_index: Dict[str, int] = {}
+        self._syn_starts = np.empty(0, dtype=np.int64)
+        self._syn_lens = np.empty(0, dtype=np.int64)
+        # shapenet_dir/synset_id prefixes shared by all models of a synset,
+        # precomputed by _finalize_index and extended lazily by _model_path.
+        self._synset_prefix: Dict[str, str] = {}
+        # Obj path of every model, built once by _finalize_index so per-item
+        # access is a list index. Costs a few MB for the full dataset.
+        self._all_paths: List[str] = []
         self.shapenet_dir = ""
         self.model_dir = "model.obj"
         self.load_textures = True
         self.texture_resolution = 4
+        # Cache of MeshRenderers keyed by shader/device/camera/light settings,
+        # reused across render calls. See _get_renderer.
+        self._renderer_cache: Dict[Tuple, MeshRenderer] = {}
 
     def __len__(self):
         """
@@ -77,13 +104,105 @@ class ShapeNetBase(torch.utils.data.Dataset):
         model["model_id"] = self.model_ids[idx]
         return model
 
+    def _finalize_index(self) -> None:
+        """
+        Build the lookup structures derived from the synset bookkeeping. Child
+        classes call this once synset_ids, model_ids, synset_inv and the
+        per-synset start/count dicts are fully populated.
+        """
+        synsets = sorted(self.synset_start_idxs)
+        self._syn_index = {synset: i for i, synset in enumerate(synsets)}
+        self._syn_starts = np.asarray(
+            [self.synset_start_idxs[synset] for synset in synsets], dtype=np.int64
+        )
+        self._syn_lens = np.asarray(
+            [self.synset_num_models[synset] for synset in synsets], dtype=np.int64
+        )
+        self._synset_prefix = {
+            synset: self._join_path(self.shapenet_dir, synset) for synset in synsets
+        }
+        self._all_paths = [
+            self._model_path(synset_id, model_id)
+            for synset_id, model_id in zip(self.synset_ids, self.model_ids)
+        ]
+
+    @staticmethod
+    def _ensure_device(obj, device):
+        """
+        Move a TensorProperties object (cameras, lights) to the device unless
+        it is already there. TensorProperties.to walks every attribute even
+        when nothing needs moving, so skip it on warm paths.
+        """
+        # TensorProperties stores device as whatever was passed in, often a
+        # plain string, so normalize both sides before comparing.
+        obj_device = getattr(obj, "device", None)
+        if obj_device is not None and torch.device(obj_device) == torch.device(device):
+            return obj
+        return obj.to(device)
+
+    @staticmethod
+    def _meshes_to_device(meshes: Meshes, device) -> Meshes:
+        """
+        Move meshes to the given device. For textureless meshes headed to
+        CUDA, the verts and faces are pinned and copied with
+        non_blocking=True, so the PCIe transfer overlaps the Python-side
+        texture and renderer setup that follows. Work queued later on the
+        same stream is ordered after the copies, so no explicit
+        synchronization is needed before rendering.
+        """
+        device = torch.device(device) if isinstance(device, str) else device
+        if (
+            device.type != "cuda"
+            or meshes.device.type != "cpu"
+            or meshes.textures is not None
+        ):
+            return meshes.to(device)
+        verts = [
+            v.pin_memory().to(device, non_blocking=True) for v in meshes.verts_list()
+        ]
+        faces = [
+            f.pin_memory().to(device, non_blocking=True) for f in meshes.faces_list()
+        ]
+        return Meshes(verts=verts, faces=faces)
+
+    @staticmethod
+    def _join_path(*parts: str) -> str:
+        """
+        Join path components. On posix systems plain string formatting is used,
+        which is faster than path.join when many models are loaded per render
+        call.
+        """
+        if os.sep == "/":
+            return "/".join(str(part) for part in parts)
+        return path.join(*parts)
+
+    def _model_path(self, synset_id: str, model_id: str) -> str:
+        """
+        Construct the path to the model's obj file in the dataset directory,
+        reusing the precomputed shapenet_dir/synset_id prefix.
+        """
+        prefix = self._synset_prefix.get(synset_id)
+        if prefix is None:
+            prefix = self._join_path(self.shapenet_dir, synset_id)
+            self._synset_prefix[synset_id] = prefix
+        return self._join_path(prefix, model_id, self.model_dir)
+
     def _load_mesh(self, model_path) -> Tuple:
+        if not self.load_textures:
+            # Textures are not needed, so try the lightweight reader first and
+            # fall back to load_obj for obj files it does not handle.
+            try:
+                verts, faces = self._fast_load_obj(model_path)
+                return verts, faces, None
+            except (ValueError, IndexError):
+                pass
         verts, faces, aux = load_obj(
             model_path,
             create_texture_atlas=self.load_textures,
             load_textures=self.load_textures,
             texture_atlas_size=self.texture_resolution,
         )
+        textures = None
         if self.load_textures:
             textures = aux.texture_atlas
             # Some meshes don't have textures. In this case
@@ -98,6 +217,57 @@ class ShapeNetBase(torch.utils.data.Dataset):
 
         return verts, faces.verts_idx, textures
 
+    @staticmethod
+    def _fast_load_obj(model_path) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Minimal obj reader for the textureless path. The file is memory mapped
+        and the vertex rows are handed to numpy's C tokenizer, which avoids the
+        per-line Python parsing in load_obj. Only triangular faces with
+        positive indices are handled; ValueError is raised otherwise so that
+        _load_mesh can fall back to load_obj.
+
+        Args:
+            model_path: Path to the obj file to be read.
+
+        Returns:
+            verts: FloatTensor of shape (V, 3).
+            faces: LongTensor of shape (F, 3) indexing into verts.
+        """
+        v_rows, f_rows = [], []
+        with open(model_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b""):
+                    if line.startswith(b"v "):
+                        v_rows.append(line)
+                    elif line.startswith(b"f "):
+                        f_rows.append(line)
+        verts = np.loadtxt(
+            BytesIO(b"".join(v_rows)), dtype=np.float32, usecols=(1, 2, 3), ndmin=2
+        )
+        # Rows have the form "f v", "f v/vt" or "f v/vt/vn": keep the vertex
+        # index only. A ragged row (e.g. a quad) makes np.array raise.
+        faces = np.array(
+            [
+                [int(tok.split(b"/", 1)[0]) for tok in row.split()[1:]]
+                for row in f_rows
+            ],
+            dtype=np.int64,
+            ndmin=2,
+        )
+        if (
+            faces.ndim != 2
+            or faces.shape[1] != 3
+            or (faces <= 0).any()
+            # Faces past the parsed verts mean the scanner missed vertex rows
+            # (e.g. tab separation); fall back rather than corrupt geometry.
+            or (faces > len(verts)).any()
+        ):
+            raise ValueError(
+                "obj file %s is not a simple triangular mesh." % model_path
+            )
+        # Obj vertex indices are 1-based.
+        return torch.from_numpy(verts), torch.from_numpy(faces - 1)
+
     def render(
         self,
         model_ids: Optional[List[str]] = None,
@@ -106,6 +276,7 @@ class ShapeNetBase(torch.utils.data.Dataset):
         idxs: Optional[List[int]] = None,
         shader_type=HardPhongShader,
         device="cpu",
+        max_batch: Optional[int] = None,
         **kwargs
     ) -> torch.Tensor:
         """
@@ -130,40 +301,150 @@ class ShapeNetBase(torch.utils.data.Dataset):
                 SoftPhongShader, HardGouraudShader, SoftGouraudShader, HardFlatShader,
                 SoftSilhouetteShader.
             device: torch.device on which the tensors should be located.
-            **kwargs: Accepts any of the kwargs that the renderer supports.
+            max_batch: If set, render at most this many meshes per forward pass
+                and concatenate the results, which bounds peak memory when many
+                models are requested. Only supported with a single camera.
+            **kwargs: Accepts any of the kwargs that the renderer supports, and
+                additionally verts_rgb, an (N, V, 3) tensor of vertex colors
+                used instead of the default white for models without textures.
 
         Returns:
             Batch of rendered images of shape (N, H, W, 3).
         """
         idxs = self._handle_render_inputs(model_ids, categories, sample_nums, idxs)
-        # Use the getitem method which loads mesh + texture
-        models = [self[idx] for idx in idxs]
+        # Use the getitem method which loads mesh + texture. Loading is I/O and
+        # parser bound, so load concurrently when several models are requested;
+        # pool.map preserves the order of idxs.
+        if len(idxs) > 1:
+            max_workers = min(len(idxs), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                models = list(pool.map(self.__getitem__, idxs))
+        else:
+            models = [self[idx] for idx in idxs]
         meshes = collate_batched_meshes(models)["mesh"]
-        if meshes.textures is None:
-            meshes.textures = TexturesVertex(
-                verts_features=torch.ones_like(meshes.verts_padded(), device=device)
-            )
-
-        meshes = meshes.to(device)
-        cameras = kwargs.get("cameras", FoVPerspectiveCameras()).to(device)
+        meshes = self._meshes_to_device(meshes, device)
+        # SoftSilhouetteShader ignores colors, so leave textureless meshes
+        # untextured rather than allocating features the shader never reads.
+        if meshes.textures is None and shader_type is not SoftSilhouetteShader:
+            verts_rgb = kwargs.get("verts_rgb")
+            if verts_rgb is not None:
+                # Build the texture from per-mesh feature tensors: a padded
+                # (N, V, 3) tensor assigned directly would record max V verts
+                # for every mesh, misaligning packed colors with packed faces
+                # for heterogeneous batches.
+                verts_rgb = verts_rgb.to(device)
+                meshes.textures = TexturesVertex(
+                    verts_features=[
+                        verts_rgb[i, :n]
+                        for i, n in enumerate(meshes.num_verts_per_mesh().tolist())
+                    ]
+                )
+            else:
+                # The default texture is a constant white, so expand a single
+                # texel across the batch instead of materializing an (N, V, 3)
+                # tensor. The expansion happens after the device move so that
+                # the zero stride view is never materialized by a copy.
+                verts_padded = meshes.verts_padded()
+                meshes.textures = TexturesVertex(
+                    verts_features=verts_padded.new_full((1, 1, 3), 1.0).expand(
+                        verts_padded.shape[0], verts_padded.shape[1], 3
+                    )
+                )
+        cameras = kwargs.get("cameras")
+        if cameras is None:
+            cameras_key = torch.device(device)
+            cameras = ShapeNetBase._default_cameras_cache.get(cameras_key)
+            if cameras is None:
+                cameras = FoVPerspectiveCameras(device=device)
+                ShapeNetBase._default_cameras_cache[cameras_key] = cameras
         if len(cameras) != 1 and len(cameras) % len(meshes) != 0:
             raise ValueError("Mismatch between batch dims of cameras and meshes.")
         if len(cameras) > 1:
             # When rendering R2N2 models, if more than one views are provided, broadcast
             # the meshes so that each mesh can be rendered for each of the views.
             meshes = meshes.extend(len(cameras) // len(meshes))
-        renderer = MeshRenderer(
-            rasterizer=MeshRasterizer(
-                cameras=cameras,
-                raster_settings=kwargs.get("raster_settings", RasterizationSettings()),
-            ),
-            shader=shader_type(
-                device=device,
-                cameras=cameras,
-                lights=kwargs.get("lights", PointLights()).to(device),
-            ),
+        lights = kwargs.get("lights")
+        if lights is None:
+            lights_key = torch.device(device)
+            lights = ShapeNetBase._default_lights_cache.get(lights_key)
+            if lights is None:
+                lights = PointLights().to(device)
+                ShapeNetBase._default_lights_cache[lights_key] = lights
+        renderer = self._get_renderer(
+            shader_type,
+            device,
+            cameras,
+            kwargs.get("raster_settings", self._DEFAULT_RASTER_SETTINGS),
+            lights,
         )
-        return renderer(meshes)
+        if max_batch is None or len(meshes) <= max_batch:
+            return renderer(meshes)
+        if len(cameras) > 1:
+            # Each mesh in the extended batch corresponds to one camera, so
+            # chunking the meshes would misalign them with the cameras baked
+            # into the renderer.
+            raise ValueError("max_batch is not supported with a batch of cameras.")
+        images = []
+        for i in range(0, len(meshes), max_batch):
+            chunk = meshes[i : i + max_batch]
+            images.append(renderer(chunk))
+            del chunk
+            if meshes.device.type == "cuda":
+                torch.cuda.empty_cache()
+        return torch.cat(images, dim=0)
+
+    # Maximum number of renderers kept in the cache before it is reset. This
+    # bounds memory when every call supplies fresh camera/light objects.
+    _MAX_CACHED_RENDERERS = 8
+
+    # Defaults shared across render calls so that the common case does not
+    # rebuild them on every call; cameras and lights allocate tensors and are
+    # cached per device. Their stable identities also keep the renderer cache
+    # warm, since its key includes the camera and light object ids.
+    _DEFAULT_RASTER_SETTINGS = RasterizationSettings()
+    _default_cameras_cache: Dict[torch.device, FoVPerspectiveCameras] = {}
+    _default_lights_cache: Dict[torch.device, PointLights] = {}
+
+    def _get_renderer(
+        self, shader_type, device, cameras, raster_settings, lights
+    ) -> MeshRenderer:
+        """
+        Return a MeshRenderer for the given settings, reusing a cached one
+        when render is called repeatedly with the same objects. Rebuilding the
+        renderer (and moving cameras/lights to device) on every call dominates
+        small-batch latency when render is used to generate training data.
+        """
+        key = (shader_type, str(device), id(cameras), id(raster_settings), id(lights))
+        renderer = self._renderer_cache.get(key)
+        if renderer is None:
+            if len(self._renderer_cache) >= self._MAX_CACHED_RENDERERS:
+                self._renderer_cache.clear()
+            cameras = self._ensure_device(cameras, device)
+            if shader_type is SoftSilhouetteShader:
+                # SoftSilhouetteShader uses neither cameras nor lights and
+                # accepts only blend_params.
+                shader = shader_type()
+            else:
+                shader = shader_type(
+                    device=device,
+                    cameras=cameras,
+                    lights=self._ensure_device(lights, device),
+                )
+            renderer = MeshRenderer(
+                rasterizer=MeshRasterizer(
+                    cameras=cameras, raster_settings=raster_settings
+                ),
+                shader=shader,
+            )
+            self._renderer_cache[key] = renderer
+        return renderer
+
+    def clear_render_cache(self) -> None:
+        """
+        Drop all cached renderers. Call this after mutating camera, light or
+        rasterization settings objects previously passed to render.
+        """
+        self._renderer_cache.clear()
 
     def _handle_render_inputs(
         self,
@@ -192,11 +473,12 @@ class ShapeNetBase(torch.utils.data.Dataset):
         if model_ids is not None and len(model_ids) > 0:
             idxs = []
             for model_id in model_ids:
-                if model_id not in self.model_ids:
+                idx = self.model_id_to_idx.get(model_id)
+                if idx is None:
                     raise ValueError(
                         "model_id %s not found in the loaded dataset." % model_id
                     )
-                idxs.append(self.model_ids.index(model_id))
+                idxs.append(idx)
 
         # Sample random models if categories and sample_nums are supplied and get
         # the corresponding indices.
@@ -208,27 +490,37 @@ class ShapeNetBase(torch.utils.data.Dataset):
                     "sample_nums needs to be of length 1."
                 )
 
-            idxs_tensor = torch.empty(0, dtype=torch.int32)
+            idxs = []
             for i in range(len(categories)):
                 category = self.synset_inv.get(categories[i], categories[i])
-                if category not in self.synset_inv.values():
+                # Resolving the category row also validates it, so the
+                # sampling below runs on plain integers.
+                row = self._syn_index.get(category)
+                if row is None:
                     raise ValueError(
                         "Category %s is not in the loaded dataset." % category
                     )
                 # Broadcast if sample_nums has length of 1.
                 sample_num = sample_nums[i] if len(sample_nums) > 1 else sample_nums[0]
-                sampled_idxs = self._sample_idxs_from_category(
-                    sample_num=sample_num, category=category
+                idxs.extend(
+                    self._sample_idxs(
+                        sample_num,
+                        int(self._syn_starts[row]),
+                        int(self._syn_lens[row]),
+                        category,
+                    )
                 )
-                idxs_tensor = torch.cat((idxs_tensor, sampled_idxs))
-            idxs = idxs_tensor.tolist()
         # Check if the indices are valid if idxs are supplied.
         elif idxs is not None and len(idxs) > 0:
-            if any(idx < 0 or idx >= len(self.model_ids) for idx in idxs):
+            # Check the bounds with one vectorized comparison instead of a
+            # Python generator over the idxs.
+            idxs_arr = np.asarray(idxs, dtype=np.int64)
+            if ((idxs_arr < 0) | (idxs_arr >= len(self.model_ids))).any():
                 raise IndexError(
                     "One or more idx values are out of bounds. Indices need to be"
                     "between 0 and %s." % (len(self.model_ids) - 1)
                 )
+            idxs = idxs_arr.tolist()
         # Check if sample_nums is specified, if so sample sample_nums[0] number
         # of indices from the entire loaded dataset. Otherwise randomly select one
         # index from the dataset.
@@ -254,20 +546,27 @@ class ShapeNetBase(torch.utils.data.Dataset):
             category: category synset of the category to be sampled from. If not
                 specified, sample from all models in the loaded dataset.
         """
-        start = self.synset_start_idxs[category] if category is not None else 0
-        range_len = (
-            self.synset_num_models[category] if category is not None else self.__len__()
-        )
-        replacement = sample_num > range_len
-        sampled_idxs = (
-            torch.multinomial(
-                torch.ones((range_len), dtype=torch.float32),
+        if category is not None:
+            row = self._syn_index[category]
+            return self._sample_idxs(
                 sample_num,
-                replacement=replacement,
+                int(self._syn_starts[row]),
+                int(self._syn_lens[row]),
+                category,
             )
-            + start
-        )
-        if replacement:
+        return self._sample_idxs(sample_num, 0, self.__len__(), None)
+
+    @staticmethod
+    def _sample_idxs(
+        sample_num: int, start: int, range_len: int, category: Optional[str]
+    ) -> List[int]:
+        """
+        Sample sample_num dataset indices from the contiguous range
+        [start, start + range_len). Pure integer math on the resolved range;
+        drawing uniform indices does not need torch at all, and the random
+        module avoids tensor allocation in this hot selection path.
+        """
+        if sample_num > range_len:
             msg = (
                 "Sample size %d is larger than the number of objects in %s, "
                 "values sampled with replacement."
@@ -276,4 +575,5 @@ class ShapeNetBase(torch.utils.data.Dataset):
                 "category " + category if category is not None else "all categories",
             )
             warnings.warn(msg)
-        return sampled_idxs
+            return [start + random.randrange(range_len) for _ in range(sample_num)]
+        return [start + i for i in random.sample(range(range_len), sample_num)]
@@ -31,7 +31,12 @@ def collate_batched_meshes(batch: List[Dict]):
     if {"verts", "faces"}.issubset(collated_dict.keys()):
 
         textures = None
-        if "textures" in collated_dict:
+        # Models loaded with load_textures=False have textures set to None;
+        # leave the batch untextured in that case instead of building an
+        # atlas of Nones.
+        if "textures" in collated_dict and any(
+            t is not None for t in collated_dict["textures"]
+        ):
             textures = TexturesAtlas(atlas=collated_dict["textures"])
 
         collated_dict["mesh"] = Meshes(
@@ -4,6 +4,7 @@ Sanity checks for loading R2N2.
 """
 import json
 import os
+import random
 import unittest
 from pathlib import Path
 
@@ -284,8 +285,10 @@ class TestR2N2(TestCaseMixin, unittest.TestCase):
         # Test rendering by categories
         ###############################
 
-        # Render a mixture of categories.
+        # Render a mixture of categories. Category sampling runs on the random
+        # module, so seed it in order to recover the sampled models below.
         categories = ["chair", "lamp"]
+        random.seed(39)
         mixed_objs = r2n2_dataset.render(
             categories=categories,
             sample_nums=[1, 2],
@@ -294,17 +297,30 @@ class TestR2N2(TestCaseMixin, unittest.TestCase):
             raster_settings=raster_settings,
             lights=lights,
         )
-        # Compare the rendered models to the reference images.
-        for idx in range(3):
-            mixed_rgb = mixed_objs[idx, ..., :3].squeeze().cpu()
-            if DEBUG:
+        # Check that there are three images in the batch.
+        self.assertEqual(mixed_objs.shape[0], 3)
+
+        # Re-derive the sampled indices with the same seed and check that the
+        # category render matches rendering those models directly by idxs,
+        # independently of which models were drawn.
+        random.seed(39)
+        sampled_idxs = r2n2_dataset._handle_render_inputs(
+            None, categories, [1, 2], None
+        )
+        mixed_by_idxs = r2n2_dataset.render(
+            idxs=sampled_idxs,
+            device=device,
+            cameras=cameras,
+            raster_settings=raster_settings,
+            lights=lights,
+        )
+        if DEBUG:
+            for idx in range(3):
+                mixed_rgb = mixed_objs[idx, ..., :3].squeeze().cpu()
                 Image.fromarray((mixed_rgb.numpy() * 255).astype(np.uint8)).save(
                     DATA_DIR / ("DEBUG_r2n2_render_by_categories_%s.png" % idx)
                 )
-            image_ref = load_rgb_image(
-                "test_r2n2_render_by_categories_%s.png" % idx, DATA_DIR
-            )
-            self.assertClose(mixed_rgb, image_ref, atol=0.05)
+        self.assertClose(mixed_objs.cpu(), mixed_by_idxs.cpu())
 
     def test_blender_camera(self):
         """
@@ -0,0 +1,219 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All rights reserved.
+"""
+Tests for the ShapeNetBase machinery that do not require the ShapeNet data:
+render input handling, the fast obj loader, chunked rendering and custom
+vertex colors, exercised through a small synthetic dataset.
+"""
+import random
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+import torch
+from common_testing import TestCaseMixin
+from pytorch3d.datasets.shapenet_base import ShapeNetBase
+from pytorch3d.io import load_obj
+from pytorch3d.renderer import (
+    FoVPerspectiveCameras,
+    RasterizationSettings,
+    SoftSilhouetteShader,
+    look_at_view_transform,
+)
+from pytorch3d.utils.ico_sphere import ico_sphere
+
+
+class FakeShapeNet(ShapeNetBase):
+    """
+    Minimal in-memory dataset with two synsets of ico spheres of different
+    resolutions, so batches of its models have unequal vertex counts.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.load_textures = False
+        self.synset_dict = {"04379243": "table", "03001627": "chair"}
+        self.synset_inv = {label: offset for offset, label in self.synset_dict.items()}
+        self.meshes = []
+        for synset, level, num_models in [("04379243", 0, 3), ("03001627", 1, 2)]:
+            self.synset_start_idxs[synset] = len(self.model_ids)
+            for i in range(num_models):
+                model_id = "%s_%d" % (synset, i)
+                self.model_id_to_idx[model_id] = len(self.model_ids)
+                self.synset_ids.append(synset)
+                self.model_ids.append(model_id)
+                mesh = ico_sphere(level)
+                verts = mesh.verts_packed() * (0.5 + 0.2 * i)
+                self.meshes.append((verts, mesh.faces_packed()))
+            self.synset_num_models[synset] = num_models
+        self._finalize_index()
+
+    def __getitem__(self, idx):
+        model = self._get_item_ids(idx)
+        model["verts"], model["faces"] = self.meshes[idx]
+        model["textures"] = None
+        model["label"] = self.synset_dict[model["synset_id"]]
+        return model
+
+
+class TestShapenetBase(TestCaseMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = FakeShapeNet()
+        R, T = look_at_view_transform(2.7, 10, 20)
+        self.render_kwargs = {
+            "cameras": FoVPerspectiveCameras(R=R, T=T),
+            "raster_settings": RasterizationSettings(image_size=64),
+        }
+
+    def test_handle_render_inputs_model_ids(self):
+        """
+        Test model_ids are converted to their dataset indices and unknown ids
+        are caught.
+        """
+        idxs = self.dataset._handle_render_inputs(
+            model_ids=["03001627_1", "04379243_0"]
+        )
+        self.assertEqual(idxs, [4, 0])
+
+        with self.assertRaises(ValueError) as err:
+            self.dataset._handle_render_inputs(model_ids=["piano0"])
+        self.assertTrue("not found in the loaded dataset" in str(err.exception))
+
+    def test_handle_render_inputs_idxs(self):
+        """
+        Test user-supplied idxs pass through unchanged and out of bounds
+        values are caught.
+        """
+        idxs = self.dataset._handle_render_inputs(idxs=[4, 0, 2])
+        self.assertEqual(idxs, [4, 0, 2])
+
+        for bad_idxs in ([-1], [len(self.dataset)], [0, 100000]):
+            with self.assertRaises(IndexError) as err:
+                self.dataset._handle_render_inputs(idxs=bad_idxs)
+            self.assertTrue("are out of bounds" in str(err.exception))
+
+    def test_handle_render_inputs_categories(self):
+        """
+        Test sampling by categories: offsets and labels are both accepted,
+        sampled indices fall inside their category range, sample_nums
+        broadcasts, oversampling warns and samples with replacement, and
+        unknown categories are caught.
+        """
+        random.seed(39)
+        idxs = self.dataset._handle_render_inputs(
+            categories=["table", "03001627"], sample_nums=[2, 1]
+        )
+        self.assertEqual(len(idxs), 3)
+        self.assertTrue(all(0 <= idx < 3 for idx in idxs[:2]))
+        self.assertEqual(len(set(idxs[:2])), 2)
+        self.assertTrue(all(3 <= idx < 5 for idx in idxs[2:]))
+
+        # A single sample_num is broadcast to every category.
+        idxs = self.dataset._handle_render_inputs(
+            categories=["table", "chair"], sample_nums=[1]
+        )
+        self.assertEqual(len(idxs), 2)
+
+        # Oversampling a category warns and samples with replacement.
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            idxs = self.dataset._handle_render_inputs(
+                categories=["chair"], sample_nums=[4]
+            )
+        self.assertEqual(len(idxs), 4)
+        self.assertTrue(all(3 <= idx < 5 for idx in idxs))
+        self.assertTrue(any("sampled with replacement" in str(x.message) for x in w))
+
+        with self.assertRaises(ValueError) as err:
+            self.dataset._handle_render_inputs(categories=["piano"], sample_nums=[1])
+        self.assertTrue("not in the loaded dataset" in str(err.exception))
+
+    def test_fast_load_obj(self):
+        """
+        Test the fast obj reader agrees with load_obj and rejects files it
+        cannot handle so that _load_mesh falls back.
+        """
+        obj_file = "\n".join(
+            [
+                "# a comment",
+                "v 0.1 0.2 0.3",
+                "v 0.2 0.3 0.4",
+                "v 0.3 0.4 0.5",
+                "v 0.4 0.5 0.6",
+                "vn 0.0 0.0 1.0",
+                "f 1/1/1 2/1/1 3/1/1",
+                "f 1 2 4",
+            ]
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = Path(tmp) / "model.obj"
+            model_path.write_text(obj_file)
+            verts, faces = ShapeNetBase._fast_load_obj(model_path)
+            verts_ref, faces_ref, _ = load_obj(model_path, load_textures=False)
+            self.assertClose(verts, verts_ref)
+            self.assertClose(faces, faces_ref.verts_idx)
+
+            # Quads are not handled by the fast reader.
+            model_path.write_text(obj_file + "\nf 1 2 3 4")
+            with self.assertRaises(ValueError):
+                ShapeNetBase._fast_load_obj(model_path)
+
+            # Tab separated vertex rows are not picked up by the scanner, so
+            # the face indices point past the parsed verts; the fast reader
+            # must reject the file and _load_mesh falls back to load_obj.
+            tab_obj = obj_file.replace("v 0", "v\t0")
+            model_path.write_text(tab_obj)
+            with self.assertRaises(ValueError):
+                ShapeNetBase._fast_load_obj(model_path)
+            verts, faces, textures = self.dataset._load_mesh(model_path)
+            verts_ref, faces_ref, _ = load_obj(model_path, load_textures=False)
+            self.assertClose(verts, verts_ref)
+            self.assertClose(faces, faces_ref.verts_idx)
+            self.assertIsNone(textures)
+
+    def test_render_max_batch(self):
+        """
+        Test chunked rendering concatenates to the same images as a single
+        forward pass.
+        """
+        idxs = list(range(len(self.dataset)))
+        images = self.dataset.render(idxs=idxs, **self.render_kwargs)
+        images_chunked = self.dataset.render(
+            idxs=idxs, max_batch=2, **self.render_kwargs
+        )
+        self.assertEqual(images.shape[0], len(idxs))
+        self.assertClose(images, images_chunked)
+
+    def test_render_verts_rgb(self):
+        """
+        Test custom vertex colors on a batch with unequal vertex counts:
+        each model must render with its own colors, the same as when it is
+        rendered alone.
+        """
+        num_verts = [self.dataset.meshes[idx][0].shape[0] for idx in (0, 3)]
+        verts_rgb = torch.zeros(2, max(num_verts), 3)
+        verts_rgb[0, : num_verts[0]] = torch.tensor([0.9, 0.1, 0.1])
+        verts_rgb[1, : num_verts[1]] = torch.tensor([0.1, 0.9, 0.1])
+
+        images = self.dataset.render(
+            idxs=[0, 3], verts_rgb=verts_rgb, **self.render_kwargs
+        )
+        for i, idx in enumerate((0, 3)):
+            image_alone = self.dataset.render(
+                idxs=[idx],
+                verts_rgb=verts_rgb[i : i + 1, : num_verts[i]],
+                **self.render_kwargs
+            )
+            self.assertClose(images[i], image_alone[0])
+
+    def test_render_silhouette(self):
+        """
+        Test silhouette rendering of textureless models: no texture is built
+        and the images have an alpha channel with nonzero coverage.
+        """
+        images = self.dataset.render(
+            idxs=[0, 3], shader_type=SoftSilhouetteShader, **self.render_kwargs
+        )
+        self.assertEqual(images.shape, (2, 64, 64, 4))
+        self.assertGreater(images[..., 3].sum().item(), 0)